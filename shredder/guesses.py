@@ -2,6 +2,8 @@
 TODO have minflux be configurable from shredx
 """
 import logging
+import numpy as np
+from numba import njit
 import ngmix
 
 logger = logging.getLogger(__name__)
@@ -26,7 +28,7 @@ def get_guess(
               TODO may want to make row, col in arcsec
             - x, y, x2, y2 all in pixel units and flux in flux units
             - these should be in zero-offset coordinates
-    rng: np.random.RandomState
+    rng: np.random.Generator or np.random.RandomState
         optional random number generator
     minflux: float, optional
         Minimum flux allowed. Default 1.0
@@ -44,8 +46,15 @@ def get_guess(
 
     assert minflux > 0.0
 
-    guess_pars = []
-    for i in range(objs.size):
+    nobj = objs.size
+
+    # draw the per-object randoms up front, one call each
+    gvals = ur(low=-0.01, high=0.01, size=(nobj, 2))
+    fracdevs = ur(low=0.45, high=0.55, size=nobj)
+    logTratios = ur(low=-0.01, high=0.01, size=nobj)
+
+    guess_pars = None
+    for i in range(nobj):
         if 'T' in objs.dtype.names:
             Tguess = objs['T'][i]  # *pixel_scale**2
             row = objs['row'][i]
@@ -71,12 +80,12 @@ def get_guess(
             row = row*pixel_scale
             col = col*pixel_scale
 
-        g1, g2 = ur(low=-0.01, high=0.01, size=2)
+        g1, g2 = gvals[i]
 
         # our dbsim obs have jacobian "center" set to 0, 0
 
         if model == 'bdf':
-            fracdev = ur(low=0.45, high=0.55)
+            fracdev = fracdevs[i]
             pars = [
                 row,
                 col,
@@ -89,8 +98,8 @@ def get_guess(
             ]
             gm_model = ngmix.GMixBDF(pars=pars)
         elif model == 'bd':
-            fracdev = ur(low=0.45, high=0.55)
-            logTratio = ur(low=-0.01, high=0.01)
+            fracdev = fracdevs[i]
+            logTratio = logTratios[i]
             pars = [
                 row,
                 col,
@@ -121,18 +130,50 @@ def get_guess(
 
         # perturb the models
         data = gm_model.get_data()
-        for j in range(data.size):
-            data['p'][j] *= (1 + ur(low=-0.05, high=0.05))
+        n = data.size
+
+        fac = 0.01
+        pfac = ur(low=-0.05, high=0.05, size=(n, 4))
+        shifts = ur(low=-fac*pixel_scale, high=fac*pixel_scale, size=(n, 2))
 
-            fac = 0.01
-            data['row'][j] += ur(low=-fac*pixel_scale, high=fac*pixel_scale)
-            data['col'][j] += ur(low=-fac*pixel_scale, high=fac*pixel_scale)
+        _perturb_gm_data(
+            data['p'], data['row'], data['col'],
+            data['irr'], data['irc'], data['icc'],
+            pfac, shifts,
+        )
 
-            data['irr'][j] *= (1 + ur(low=-0.05, high=0.05))
-            data['irc'][j] *= (1 + ur(low=-0.05, high=0.05))
-            data['icc'][j] *= (1 + ur(low=-0.05, high=0.05))
+        pars = gm_model.get_full_pars()
+        npars = pars.size
+        if guess_pars is None:
+            # all objects have the same number of gaussians
+            guess_pars = np.empty(nobj*npars)
 
-        guess_pars += list(gm_model.get_full_pars())
+        guess_pars[i*npars:(i+1)*npars] = pars
 
     gm_guess = ngmix.GMix(pars=guess_pars)
     return gm_guess
+
+
+@njit(cache=True)
+def _perturb_gm_data(p, row, col, irr, irc, icc, pfac, shifts):
+    """
+    perturb the gaussian mixture data in place
+
+    Parameters
+    ----------
+    p, row, col, irr, irc, icc: arrays
+        Views of the fields of the gaussian mixture data
+    pfac: array
+        Fractional perturbations, shape (n, 4), applied to p, irr, irc, icc
+    shifts: array
+        Shifts to the centers, shape (n, 2), applied to row, col
+    """
+    for j in range(p.size):
+        p[j] *= (1 + pfac[j, 0])
+
+        row[j] += shifts[j, 0]
+        col[j] += shifts[j, 1]
+
+        irr[j] *= (1 + pfac[j, 1])
+        irc[j] *= (1 + pfac[j, 2])
+        icc[j] *= (1 + pfac[j, 3])
@@ -20,7 +20,7 @@ def do_psf_fit(obs, ngauss, ntry=4, rng=None):
         Observations to fit
     ngauss: int
         Number of coelliptical gaussians to fit
-    rng: np.random.RandomState
+    rng: np.random.Generator or np.random.RandomState
         random number generator
     """
 
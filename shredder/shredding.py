@@ -3,8 +3,10 @@ TODO
     - consider doing psf fitting outside the shredder
 """
 import logging
+import numpy as np
 import ngmix
 from ngmix.flags import EM_MAXITER
+from ngmix.gexceptions import GMixRangeError
 
 from . import procflags
 from . import coadding
@@ -13,6 +15,9 @@ from .psf_fitting import do_psf_fit
 
 logger = logging.getLogger(__name__)
 
+# number of em iterations between extrapolation steps when accelerating
+ACCEL_NITER = 10
+
 
 class Shredder(object):
     def __init__(
@@ -26,6 +31,7 @@ class Shredder(object):
         flux_maxiter=500,
         tol=0.001,
         vary_sky=False,
+        accelerate=False,
     ):
         """
         Parameters
@@ -35,7 +41,7 @@ class Shredder(object):
         psf_ngauss: int
             Number of gaussians for psf
         rng: random number generator
-            E.g. np.random.RandomState.
+            E.g. np.random.default_rng().
         miniter: int, optional
             Mininum number of iterations, default 40
         maxiter: int, optional
@@ -48,8 +54,15 @@ class Shredder(object):
             The tolerance in the weighted logL, default 1.e-3
         vary_sky: bool, optional
             If True, vary the sky
+        accelerate: bool, optional
+            If True, apply Nesterov extrapolation to the coadd em fit,
+            which can reduce the number of iterations needed to converge.
+            Not supported with vary_sky
         """
 
+        if accelerate and vary_sky:
+            raise ValueError('accelerate is not supported with vary_sky')
+
         # TODO deal with Observation input, which would only use
         # the "coadd" result and would not actually coadd
 
@@ -67,6 +80,7 @@ class Shredder(object):
 
         self.tol = tol
         self.vary_sky = vary_sky
+        self.accelerate = accelerate
 
         self._do_psf_fits(self.mbobs, psf_ngauss)
 
@@ -181,6 +195,9 @@ class Shredder(object):
 
         emobs, sky = ngmix.em.prep_obs(self.coadd_obs)
 
+        if self.accelerate:
+            return self._do_accelerated_coadd_fit(emobs, gmix_guess, sky)
+
         em = ngmix.em.EMFitterFixCen(
             miniter=self.miniter,
             maxiter=self.maxiter,
@@ -190,6 +207,92 @@ class Shredder(object):
 
         return em.go(obs=emobs, guess=gmix_guess, sky=sky)
 
+    def _do_accelerated_coadd_fit(self, emobs, gmix_guess, sky):
+        """
+        run the fixed-center em fitter in blocks of ACCEL_NITER iterations,
+        applying a Nesterov extrapolation to the mixture between blocks.
+
+        The extrapolated mixture is only used if it increases the
+        likelihood, otherwise the plain em result is used.  If a block
+        started from an extrapolated mixture fails, it is discarded and
+        rerun from the plain em result, and the extrapolation restarts;
+        iterations from discarded blocks do not count toward maxiter
+        """
+
+        guess = gmix_guess
+        from_trial = False
+        plain_gmix = None
+        prev_pars = None
+        numiter = 0
+        step = 0
+
+        while True:
+            # the last block is shortened so the total does not
+            # exceed maxiter
+            em = ngmix.em.EMFitterFixCen(
+                miniter=1,
+                maxiter=min(ACCEL_NITER, self.maxiter - numiter),
+                tol=self.tol,
+            )
+            res = em.go(obs=emobs, guess=guess, sky=sky)
+
+            failed = (
+                not res.has_gmix() or
+                res['flags'] & ~EM_MAXITER != 0
+            )
+
+            if failed and from_trial:
+                logger.debug('extrapolated start failed, using plain em')
+                guess = plain_gmix
+                from_trial = False
+                prev_pars = None
+                step = 0
+                continue
+
+            numiter += res['numiter']
+            res['numiter'] = numiter
+
+            if failed or numiter >= self.maxiter:
+                break
+
+            if res['flags'] == 0 and numiter >= self.miniter:
+                break
+
+            plain_gmix = res.get_gmix()
+            pars = plain_gmix.get_full_pars()
+
+            guess = plain_gmix
+            from_trial = False
+
+            if prev_pars is not None:
+                step += 1
+                beta = step/(step + 3)
+
+                trial = _get_extrapolated_gmix(
+                    pars=pars, prev_pars=prev_pars, beta=beta,
+                )
+                if trial is not None:
+                    trial_loglike = self._get_coadd_loglike(trial)
+                    plain_loglike = self._get_coadd_loglike(plain_gmix)
+                    if trial_loglike > plain_loglike:
+                        guess = trial
+                        from_trial = True
+
+            prev_pars = pars
+
+        return res
+
+    def _get_coadd_loglike(self, gmix):
+        """
+        get the log likelihood of the coadd for the pre-psf mixture
+        """
+        obs = self.coadd_obs
+        try:
+            gm_convolved = gmix.convolve(obs.psf.gmix)
+            return gm_convolved.get_loglike(obs)
+        except GMixRangeError:
+            return -np.inf
+
     def _do_multiband_fit(self):
         """
         tweak the mixture for each band and set the total flux
@@ -260,9 +363,8 @@ class Shredder(object):
         gmix_guess = self._result['coadd_gmix'].copy()
 
         gdata = gmix_guess.get_data()
-        for idata in range(gdata.size):
-            rnum = rng.uniform(low=-0.01, high=0.01)
-            gdata['p'][idata] *= (1.0 + rnum)
+        rnums = rng.uniform(low=-0.01, high=0.01, size=gdata.size)
+        gdata['p'] *= (1.0 + rnums)
 
         return gmix_guess
 
@@ -280,3 +382,36 @@ class Shredder(object):
         #     flags = procflags.PSF_FAILURE
         #
         # return {'flags': flags}
+
+
+def _get_extrapolated_gmix(pars, prev_pars, beta):
+    """
+    get the mixture extrapolated from the last two iterates, or None
+    if the extrapolated mixture is not valid
+
+    Parameters
+    ----------
+    pars: array
+        Full parameters of the latest mixture
+    prev_pars: array
+        Full parameters of the previous mixture
+    beta: float
+        The extrapolation weight
+
+    Returns
+    -------
+    ngmix.GMix or None
+    """
+    trial_pars = pars + beta*(pars - prev_pars)
+
+    try:
+        trial = ngmix.GMix(pars=trial_pars)
+    except GMixRangeError:
+        return None
+
+    data = trial.get_data()
+    det = data['irr']*data['icc'] - data['irc']**2
+    if np.any(data['p'] <= 0) or np.any(det <= 0):
+        return None
+
+    return trial
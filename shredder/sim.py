@@ -54,7 +54,7 @@ class Sim(dict):
     """
     def __init__(self, rng=None, config=None):
         if rng is None:
-            rng = np.random.RandomState()
+            rng = np.random.default_rng()
 
         self.rng = rng
 
@@ -111,9 +111,15 @@ class Sim(dict):
 
     def get_psf_obs(self):
         """
-        get a copy of the psf observation
+        get a new psf observation; the image, weight and jacobian are
+        shared with the stored psf observation rather than copied
         """
-        return self._psf_obs.copy()
+        psf_obs = self._psf_obs
+        return ngmix.Observation(
+            psf_obs.image,
+            weight=psf_obs.weight,
+            jacobian=psf_obs.jacobian,
+        )
 
     def _set_centers(self, obs, obj_data_in):
         """
@@ -167,11 +173,10 @@ class Sim(dict):
         iconf = self['image']
 
         dims = [iconf['dim_pixels']]*2
-        weight = np.zeros(dims)
-        weight[:, :] = 1.0/iconf['noise']**2
+        weight = np.full(dims, 1.0/iconf['noise']**2)
 
         if iconf['bad_columns']:
-            badcol = self.rng.randint(0, dims[1])
+            badcol = self.rng.choice(dims[1])
             weight[:, badcol] = 0
             image[:, badcol] = 0.0
             # weight[:, badcol-1:badcol+2] = 0
@@ -190,17 +195,20 @@ class Sim(dict):
         imodels = []
         odlist = []
         for i in range(self['objects']['nobj']):
-            band_models, odata = self._get_convolved_models()
+            band_models, odata = self._get_models()
             gmodels.append(band_models[0])
             rmodels.append(band_models[1])
             imodels.append(band_models[2])
 
             odlist.append(odata)
 
+        # convolve the sum of the objects, so the psf k-space values are
+        # evaluated once per band rather than once per object
+        psf = self.get_psf()
         band_models = [
-            galsim.Add(gmodels),
-            galsim.Add(rmodels),
-            galsim.Add(imodels),
+            galsim.Convolve(galsim.Add(gmodels), psf),
+            galsim.Convolve(galsim.Add(rmodels), psf),
+            galsim.Convolve(galsim.Add(imodels), psf),
         ]
 
         iconf = self['image']
@@ -219,23 +227,6 @@ class Sim(dict):
         obj_data = eu.numpy_util.combine_arrlist(odlist)
         return band_images, obj_data
 
-    def _get_convolved_models(self):
-        """
-        get models convolved by the psf for each band
-        """
-        import galsim
-        band_models0, obj_data = self._get_models()
-
-        band_models = []
-        for model0 in band_models0:
-            model = galsim.Convolve(
-                model0,
-                self.get_psf(),
-            )
-            band_models.append(model)
-
-        return band_models, obj_data
-
     def _get_models(self):
         """
         get models for each band
@@ -379,7 +370,7 @@ class Sim(dict):
             size=psf_image.shape,
             scale=psf_noise,
         )
-        psf_weight = psf_image*0 + 1.0/psf_noise**2
+        psf_weight = np.full(psf_image.shape, 1.0/psf_noise**2)
 
         cen = (np.array(psf_image.shape)-1)/2
         jac = ngmix.DiagonalJacobian(
@@ -401,7 +392,7 @@ def test(ntrial=1, seed=None, show=False, scale=2):
     """
     from . import vis
 
-    rng = np.random.RandomState(seed)
+    rng = np.random.default_rng(seed)
     sim = Sim(rng)
 
     for i in range(ntrial):
@@ -1,6 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 import numpy as np
+from numba import njit
 import ngmix
+from ngmix.gmix.render_nb import render
 from . import vis
 
 
@@ -14,14 +17,20 @@ class ModelSubtractor(object):
         The shredder used for deblending
     nobj: int
         Number of objects represented in the results.
+    nthreads: int, optional
+        Number of threads used to render the models.  Default 1, which
+        renders in the calling thread; None uses the ThreadPoolExecutor
+        default
     """
-    def __init__(self, shredder, nobj):
+    def __init__(self, shredder, nobj, nthreads=1):
         self.shredder = shredder
         self.nobj = nobj
+        self.nthreads = nthreads
+
+        self._bbox_cache = {}
 
         self._set_ngauss_per()
         self._build_models()
-        self._build_subtracted_mbobs()
 
     @contextmanager
     def add_source(self, index):
@@ -48,13 +57,13 @@ class ModelSubtractor(object):
         if index < 0 or index > imax:
             raise IndexError('index {index} out range [0, {imax}]')
 
-        self._add_or_subtract_model_image(index, 'add')
+        self._add_model_image(index)
 
         try:
             # usually won't use this yielded value
             yield self.mbobs
         finally:
-            self._add_or_subtract_model_image(index, 'subtract')
+            self._subtract_model_image(index)
 
     def plot_object(self, index, stamp_size):
         """
@@ -92,20 +101,18 @@ class ModelSubtractor(object):
             so the object center is in the center pixel
         """
 
+        if index < 0 or index > self.nobj-1:
+            raise IndexError(f'no such object index {index}')
+
         # all bands share the same center
-        gm = self.get_object_gmix(index, band=0)
-        v_orig, u_orig = gm.get_cen()
+        rows, cols = self._get_rowcols()
+        row_orig, col_orig = rows[index], cols[index]
 
         obs0_orig = self.shredder.mbobs[0][0]
         jacobian = obs0_orig.jacobian.copy()
-        row_orig, col_orig = jacobian.get_rowcol(v=v_orig, u=u_orig)
-
-        # this may trim off one at the beginning or end in some cases
-        # seems unavoidable
-        row_start, row_end, col_start, col_end = _get_bbox(
-            image_shape=obs0_orig.image.shape,
-            row=row_orig, col=col_orig,
-            stamp_size=stamp_size,
+
+        row_start, row_end, col_start, col_end = self._get_object_bbox(
+            index=index, stamp_size=stamp_size,
         )
 
         jacobian.set_cen(
@@ -276,32 +283,82 @@ class ModelSubtractor(object):
         dt = [('row', 'f4'), ('col', 'f4')]
         objs = np.zeros(self.nobj, dtype=dt)
 
-        obs0_orig = self.shredder.mbobs[0][0]
-        for index in range(self.nobj):
-            gm = self.get_object_gmix(index, band=0)
-            v_orig, u_orig = gm.get_cen()
-
-            jacobian = obs0_orig.jacobian.copy()
-            row_orig, col_orig = jacobian.get_rowcol(v=v_orig, u=u_orig)
-            objs['row'][index] = row_orig
-            objs['col'][index] = col_orig
+        objs['row'], objs['col'] = self._get_rowcols()
 
         return objs
 
-    def _add_or_subtract_model_image(self, index, type):
-        mbobs = self.mbobs
-        model_images = self.model_images
+    def _get_rowcols(self):
+        """
+        get the row and col of each object in the original image
+        """
+        if not hasattr(self, '_rowcols'):
+            rows = np.zeros(self.nobj)
+            cols = np.zeros(self.nobj)
+
+            jacobian = self.shredder.mbobs[0][0].jacobian
+            for index in range(self.nobj):
+                gm = self.get_object_gmix(index, band=0)
+                v_orig, u_orig = gm.get_cen()
+
+                rows[index], cols[index] = jacobian.get_rowcol(
+                    v=v_orig, u=u_orig,
+                )
+
+            self._rowcols = rows, cols
+
+        return self._rowcols
+
+    def _get_object_bbox(self, index, stamp_size):
+        """
+        get the stamp bbox for the object.  The bboxes for all objects are
+        computed together and cached for each stamp size
+        """
+        if stamp_size not in self._bbox_cache:
+            rows, cols = self._get_rowcols()
+            self._bbox_cache[stamp_size] = _get_bboxes(
+                image_shape=self.shredder.mbobs[0][0].image.shape,
+                rows=rows, cols=cols,
+                stamp_size=stamp_size,
+            )
+
+        image_shape = self.shredder.mbobs[0][0].image.shape
+        row_start, row_end, col_start, col_end = [
+            int(vals[index]) for vals in self._bbox_cache[stamp_size]
+        ]
+
+        _check_start_end(
+            start=row_start, end=row_end, image_dim=image_shape[0],
+            type='row',
+        )
+        _check_start_end(
+            start=col_start, end=col_end, image_dim=image_shape[1],
+            type='col',
+        )
+        assert row_start - row_end == col_start - col_end, 'non round found'
+
+        return row_start, row_end, col_start, col_end
 
-        for obslist, band_model_images in zip(mbobs, model_images):
+    def _add_model_image(self, index):
+        for obslist, band_model_images in zip(self.mbobs, self.model_images):
             obs = obslist[0]
+            row_start, col_start, stamp = band_model_images[index]
+            nrow, ncol = stamp.shape
 
-            model_image = band_model_images[index]
+            with obs.writeable():
+                obs.image[
+                    row_start:row_start+nrow, col_start:col_start+ncol,
+                ] += stamp
+
+    def _subtract_model_image(self, index):
+        for obslist, band_model_images in zip(self.mbobs, self.model_images):
+            obs = obslist[0]
+            row_start, col_start, stamp = band_model_images[index]
+            nrow, ncol = stamp.shape
 
             with obs.writeable():
-                if type == 'add':
-                    obs.image += model_image
-                else:
-                    obs.image -= model_image
+                obs.image[
+                    row_start:row_start+nrow, col_start:col_start+ncol,
+                ] -= stamp
 
     def _set_ngauss_per(self):
         res = self.shredder.result
@@ -319,102 +376,189 @@ class ModelSubtractor(object):
         self.ngauss_per = ngauss // self.nobj
 
     def _build_models(self):
+        """
+        render each object model into a stamp covering its bounding box
+        and build the model subtracted observations in .mbobs
+
+        the models are stored as (row_start, col_start, stamp) for each
+        object in each band, with float32 stamps.  Pixels with zero weight
+        are skipped and left at zero in the models
+        """
         mbobs_orig = self.shredder.mbobs
 
-        self.model_images = []
+        # bands typically share the image shape and wcs, so the
+        # coordinates can be reused
+        coords_cache = {}
+
+        tasks = []
+        stamps = []
+        masked = []
 
         for band, obslist in enumerate(mbobs_orig):
             obs = obslist[0]
 
-            band_model_images = []
+            band_stamps = []
+            band_mask = obs.weight > 0
 
-            coords = ngmix.pixels.make_coords(obs.image.shape, obs.jacobian)
+            key = (obs.image.shape, obs.jacobian._data.tobytes())
+            if key not in coords_cache:
+                coords_cache[key] = ngmix.pixels.make_coords(
+                    obs.image.shape, obs.jacobian,
+                ).reshape(obs.image.shape)
+            coords = coords_cache[key]
 
             for iobj in range(self.nobj):
                 gm = self.get_object_gmix_data_convolved(iobj, band)
 
-                model_image = np.zeros_like(obs.image)
-                ngmix.gmix.render_nb.render(
-                    gm, coords, model_image.ravel(), fast_exp=1,
+                row_start, row_end, col_start, col_end = _get_model_bbox(
+                    gm=gm,
+                    jacobian=obs.jacobian,
+                    image_shape=obs.image.shape,
                 )
-                band_model_images.append(model_image)
-
-            self.model_images.append(band_model_images)
+                stamp_coords = coords[row_start:row_end, col_start:col_end]
+                stamp_mask = band_mask[row_start:row_end, col_start:col_end]
 
-    def _build_subtracted_mbobs(self):
+                stamp = np.zeros((row_end - row_start, col_end - col_start))
 
-        mbobs_orig = self.shredder.mbobs
-        model_images = self.model_images
+                if stamp_mask.all():
+                    tasks.append((gm, stamp_coords.ravel(), stamp.ravel()))
+                else:
+                    # zero weight pixels are not rendered, the model
+                    # is left at zero there
+                    stamp_coords = stamp_coords[stamp_mask]
+                    values = np.zeros(stamp_coords.size)
+                    tasks.append((gm, stamp_coords, values))
+                    masked.append((stamp, stamp_mask, values))
+
+                band_stamps.append((row_start, col_start, stamp))
+
+            stamps.append(band_stamps)
+
+        # the renders are independent and release the gil
+        if self.nthreads == 1:
+            for task in tasks:
+                _render_model(*task)
+        else:
+            with ThreadPoolExecutor(max_workers=self.nthreads) as executor:
+                futures = [
+                    executor.submit(_render_model, *task) for task in tasks
+                ]
+                for future in futures:
+                    future.result()
+
+        for stamp, stamp_mask, values in masked:
+            stamp[stamp_mask] = values
+
+        # subtract the models as they are stored, so no separate pass
+        # over the stored models is needed
         self.mbobs = ngmix.MultiBandObsList()
+        self.model_images = []
 
-        for obslist, band_model_images in zip(mbobs_orig, model_images):
-            obs = obslist[0]
-
-            diff_obs = obs.copy()
+        for obslist, band_stamps in zip(mbobs_orig, stamps):
+            diff_obs = obslist[0].copy()
 
+            band_model_images = []
             with diff_obs.writeable():
-                for model_image in band_model_images:
-                    diff_obs.image -= model_image
+                diff_image = diff_obs.image
+                for row_start, col_start, stamp in band_stamps:
+                    # single precision is plenty for models subtracted
+                    # from noisy images
+                    stamp = stamp.astype('f4')
+                    nrow, ncol = stamp.shape
+
+                    diff_image[
+                        row_start:row_start+nrow, col_start:col_start+ncol,
+                    ] -= stamp
+
+                    band_model_images.append((row_start, col_start, stamp))
 
             diff_obslist = ngmix.ObsList()
             diff_obslist.append(diff_obs)
 
             self.mbobs.append(diff_obslist)
+            self.model_images.append(band_model_images)
+
+
+@njit(nogil=True, cache=True)
+def _render_model(gm, coords, image):
+    """
+    render the mixture data into the image with the fast exponential;
+    compiled without the gil so models can be rendered in threads
+    """
+    render(gm, coords, image, 1)
+
+
+def _get_model_bbox(gm, jacobian, image_shape, nsigma=5):
+    """
+    get the pixel range [start, end) covering all gaussians in the
+    mixture data out to nsigma, trimmed to the image.  The renderer
+    does not evaluate gaussians beyond 5 sigma, so nothing is lost
+    for the default
+    """
+
+    vrad = nsigma*np.sqrt(gm['irr'])
+    urad = nsigma*np.sqrt(gm['icc'])
+
+    vmin = (gm['row'] - vrad).min()
+    vmax = (gm['row'] + vrad).max()
+    umin = (gm['col'] - urad).min()
+    umax = (gm['col'] + urad).max()
 
+    rows = []
+    cols = []
+    for v, u in ((vmin, umin), (vmin, umax), (vmax, umin), (vmax, umax)):
+        row, col = jacobian.get_rowcol(v=v, u=u)
+        rows.append(row)
+        cols.append(col)
 
-def _get_bbox(image_shape, row, col, stamp_size):
+    row_start = int(np.clip(np.floor(min(rows)), 0, image_shape[0]))
+    row_end = int(np.clip(np.ceil(max(rows)) + 1, row_start, image_shape[0]))
+    col_start = int(np.clip(np.floor(min(cols)), 0, image_shape[1]))
+    col_end = int(np.clip(np.ceil(max(cols)) + 1, col_start, image_shape[1]))
+
+    return row_start, row_end, col_start, col_end
+
+
+def _get_bboxes(image_shape, rows, cols, stamp_size):
+    """
+    get stamp bboxes for arrays of centers
+
+    this may trim off one at the beginning or end in some cases
+    seems unavoidable
+    """
 
     rad = int(stamp_size) // 2
 
-    row_start, row_end = _get_start_end(
-        image_dim=image_shape[0],
-        cen=row, rad=rad,
-    )
-    col_start, col_end = _get_start_end(
-        image_dim=image_shape[1],
-        cen=col, rad=rad,
-    )
+    row_starts, row_ends = _get_starts_ends(cens=rows, rad=rad)
+    col_starts, col_ends = _get_starts_ends(cens=cols, rad=rad)
 
-    row_start, row_end, col_start, col_end = _trim_one_maybe(
+    return _trim_one_maybe(
         image_shape,
-        row_start, row_end, col_start, col_end,
+        row_starts, row_ends, col_starts, col_ends,
     )
 
-    _check_start_end(
-        start=row_start, end=row_end, image_dim=image_shape[0], type='row',
-    )
-    _check_start_end(
-        start=col_start, end=col_end, image_dim=image_shape[1], type='col',
-    )
-    assert row_start - row_end == col_start - col_end, 'non round found'
 
-    return row_start, row_end, col_start, col_end
+def _trim_one_maybe(image_shape, row_start, row_end, col_start, col_end):
+    """
+    trim by one pixel where the bbox extends one beyond the image,
+    maintaining square bboxes; the inputs are arrays and are modified
+    in place
+    """
+    w = row_start == -1
+    row_start[w] += 1
+    col_start[w] += 1
 
+    w = col_start == -1
+    col_start[w] += 1
+    row_start[w] += 1
 
-def _trim_one_maybe(image_shape, row_start, row_end, col_start, col_end):
-    if row_start < 0:
-        if row_start == -1:
-            # maintain square image
-            row_start += 1
-            col_start += 1
-
-    if col_start < 0:
-        if col_start == -1:
-            # maintain square image
-            col_start += 1
-            row_start += 1
-
-    if row_end > image_shape[0]:
-        if row_end == image_shape[0] + 1:
-            # maintain square image
-            row_end -= 1
-            col_end -= 1
-
-    if col_end > image_shape[1]:
-        if col_end == image_shape[1] + 1:
-            # maintain square image
-            col_end -= 1
-            row_end -= 1
+    w = row_end == image_shape[0] + 1
+    row_end[w] -= 1
+    col_end[w] -= 1
+
+    w = col_end == image_shape[1] + 1
+    col_end[w] -= 1
+    row_end[w] -= 1
 
     return row_start, row_end, col_start, col_end
 
@@ -429,9 +573,9 @@ def _check_start_end(start, end, image_dim, type):
     return start, end
 
 
-def _get_start_end(image_dim, cen, rad):
+def _get_starts_ends(cens, rad):
     # this is how the stack code is currently working
-    icen = int(round(cen))
-    start = icen - rad
-    end = icen + rad + 1
-    return start, end
+    icens = np.rint(cens).astype('i8')
+    starts = icens - rad
+    ends = icens + rad + 1
+    return starts, ends
@@ -78,6 +78,38 @@ def test_shredder_smoke(seed, vary_sky, show=False):
         s.plot_comparison(show=True, title=title)
 
 
+@pytest.mark.parametrize('seed', [31, 4417])
+def test_shredder_generator(seed):
+    """
+    test we can run end to end with a numpy Generator, which is passed on
+    to the guesses and the psf fitting
+    """
+
+    rng = np.random.default_rng(seed)
+
+    sim = shredder.sim.Sim(rng=rng)
+    mbobs = sim()
+
+    scale = sim['image']['pixel_scale']
+
+    obj_data = mbobs.meta['obj_data']
+    objs = _add_T_and_scale(obj_data, scale)
+
+    gm_guess = shredder.get_guess(
+        objs,
+        jacobian=mbobs[0][0].jacobian,
+        model='dev',
+        rng=rng,
+    )
+
+    s = shredder.Shredder(obs=mbobs, psf_ngauss=2, rng=rng)
+    s.shred(gm_guess)
+
+    res = s.get_result()
+    logger.info('coadd: %s', res['coadd_result'])
+    assert res['flags'] == 0
+
+
 @pytest.mark.parametrize('seed', [99, 105])
 def test_shredder_stars_gaussian(seed, show=False):
     """
@@ -212,7 +244,8 @@ def test_shredder_stars_moffat(seed, show=False):
 
 
 @pytest.mark.parametrize('seed', [125, 871])
-def test_shredder(seed):
+@pytest.mark.parametrize('accelerate', [False, True])
+def test_shredder(seed, accelerate):
     """
     test that the fit is pretty good
     """
@@ -235,7 +268,12 @@ def test_shredder(seed):
         rng=rng,
     )
 
-    s = shredder.Shredder(obs=mbobs, psf_ngauss=psf_ngauss, rng=rng)
+    s = shredder.Shredder(
+        obs=mbobs,
+        psf_ngauss=psf_ngauss,
+        accelerate=accelerate,
+        rng=rng,
+    )
     s.shred(gm_guess)
 
     res = s.get_result()
@@ -263,6 +301,146 @@ def test_shredder(seed):
     assert chi2per < 1.05
 
 
+@pytest.mark.parametrize('seed', [125, 871])
+def test_shredder_accelerate_numiter(seed):
+    """
+    test the accelerated coadd fit needs no more iterations than plain em
+    """
+    rng = np.random.RandomState(seed)
+    sim = shredder.sim.Sim(rng=rng)
+    mbobs = sim()
+
+    guess_model = 'dev'
+    psf_ngauss = 2
+
+    scale = sim['image']['pixel_scale']
+
+    obj_data = mbobs.meta['obj_data']
+    objs = _add_T_and_scale(obj_data, scale)
+
+    gm_guess = shredder.get_guess(
+        objs,
+        jacobian=mbobs[0][0].jacobian,
+        model=guess_model,
+        rng=rng,
+    )
+
+    numiters = {}
+    for accelerate in [False, True]:
+        # same rng state for both, so the psf fits match
+        s = shredder.Shredder(
+            obs=mbobs,
+            psf_ngauss=psf_ngauss,
+            accelerate=accelerate,
+            rng=np.random.RandomState(seed),
+        )
+        s.shred(gm_guess.copy())
+
+        res = s.get_result()
+        assert res['flags'] == 0
+
+        numiters[accelerate] = res['coadd_result']['numiter']
+
+    logger.info('numiter: %s', numiters)
+    assert numiters[True] <= numiters[False]
+
+
+@pytest.mark.parametrize('seed', [125])
+def test_shredder_accelerate_fallback(seed, monkeypatch):
+    """
+    test a failed fit from an extrapolated start falls back to the plain
+    em iterate rather than failing the coadd fit
+    """
+    import ngmix
+    from ngmix.flags import EM_MAXITER
+    import shredder.shredding
+
+    rng = np.random.RandomState(seed)
+    sim = shredder.sim.Sim(rng=rng)
+    mbobs = sim()
+
+    scale = sim['image']['pixel_scale']
+
+    obj_data = mbobs.meta['obj_data']
+    objs = _add_T_and_scale(obj_data, scale)
+
+    gm_guess = shredder.get_guess(
+        objs,
+        jacobian=mbobs[0][0].jacobian,
+        model='dev',
+        rng=rng,
+    )
+
+    s = shredder.Shredder(
+        obs=mbobs,
+        psf_ngauss=2,
+        accelerate=True,
+        rng=rng,
+    )
+
+    ntrial = [0]
+
+    def get_trial(pars, prev_pars, beta):
+        # a copy of the plain iterate, marked as the trial
+        trial = ngmix.GMix(pars=pars)
+        trial.is_trial = True
+        ntrial[0] += 1
+        return trial
+
+    def get_loglike(gmix):
+        # always accept the trial
+        return np.inf if getattr(gmix, 'is_trial', False) else 0.0
+
+    EMFitterFixCen = ngmix.em.EMFitterFixCen
+
+    class FailFromTrial(EMFitterFixCen):
+        def go(self, obs, guess, sky=None):
+            res = super().go(obs=obs, guess=guess, sky=sky)
+            if getattr(guess, 'is_trial', False):
+                res['flags'] |= EM_MAXITER << 1
+            return res
+
+    monkeypatch.setattr(
+        shredder.shredding, '_get_extrapolated_gmix', get_trial,
+    )
+    monkeypatch.setattr(s, '_get_coadd_loglike', get_loglike)
+    monkeypatch.setattr(ngmix.em, 'EMFitterFixCen', FailFromTrial)
+
+    s.shred(gm_guess)
+
+    res = s.get_result()
+    logger.info('coadd: %s', res['coadd_result'])
+    assert ntrial[0] > 0
+    assert res['flags'] == 0
+    assert res['coadd_result']['numiter'] <= s.maxiter
+
+
+def test_get_extrapolated_gmix():
+    """
+    test extrapolated mixtures are rejected when not valid
+    """
+    from shredder.shredding import _get_extrapolated_gmix
+
+    # p, row, col, irr, irc, icc
+    pars = np.array([1.0, 0.0, 0.0, 1.0, 0.0, 1.0])
+
+    gm = _get_extrapolated_gmix(pars=pars, prev_pars=pars, beta=0.5)
+    assert gm is not None
+    assert np.allclose(gm.get_full_pars(), pars)
+
+    # extrapolates to p = 0
+    prev_pars = pars.copy()
+    prev_pars[0] = 2.0
+    gm = _get_extrapolated_gmix(pars=pars, prev_pars=prev_pars, beta=1.0)
+    assert gm is None
+
+    # extrapolates to irc = 1, so the determinant is zero
+    prev_pars = pars.copy()
+    prev_pars[4] = -1.0
+    gm = _get_extrapolated_gmix(pars=pars, prev_pars=prev_pars, beta=1.0)
+    assert gm is None
+
+
 @pytest.mark.parametrize('seed', [9731, 7317])
 def test_shredder_bad_columns(seed, show=False):
     """
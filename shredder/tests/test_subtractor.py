@@ -1,5 +1,7 @@
+from types import SimpleNamespace
 import numpy as np
 import shredder
+from shredder.subtractor import _get_bboxes
 import esutil as eu
 import pytest
 import logging
@@ -28,6 +30,46 @@ def _add_T_and_scale(obj_data, scale):
     return objs
 
 
+def _run_shredder(rng, bad_columns=False):
+    """
+    run the shredder on a sim, returning the shredder and the objects
+    """
+    sim = shredder.sim.Sim(rng=rng)
+    sim['image']['bad_columns'] = bad_columns
+    mbobs = sim()
+
+    guess_model = 'dev'
+    psf_ngauss = 2
+
+    scale = sim['image']['pixel_scale']
+
+    obj_data = mbobs.meta['obj_data']
+    objs = _add_T_and_scale(obj_data, scale)
+
+    gm_guess = shredder.get_guess(
+        objs,
+        jacobian=mbobs[0][0].jacobian,
+        model=guess_model,
+        rng=rng,
+    )
+
+    s = shredder.Shredder(obs=mbobs, psf_ngauss=psf_ngauss, rng=rng)
+    s.shred(gm_guess)
+
+    assert s.get_result()['flags'] == 0
+    return s, objs
+
+
+def _get_full_frame_model(s, band):
+    """
+    render the full band model over the entire image, using the same fast
+    exponential as the subtractor
+    """
+    gm = s.get_result()['band_gmix_convolved'][band]
+    obs = s.mbobs[band][0]
+    return gm.make_image(obs.image.shape, jacobian=obs.jacobian, fast_exp=True)
+
+
 @pytest.mark.parametrize('seed', [91, 22])
 def test_subtractor_smoke(seed, show=False):
 
@@ -124,6 +166,145 @@ def test_subtractor(seed):
     assert chi2per < 1.05
 
 
+@pytest.mark.parametrize('seed', [125, 871])
+def test_subtractor_full_frame(seed):
+    """
+    test the models rendered in stamps match a full frame render
+    """
+    rng = np.random.RandomState(seed)
+    s, objs = _run_shredder(rng)
+
+    subtractor = shredder.ModelSubtractor(shredder=s, nobj=objs.size)
+
+    for band, obslist in enumerate(subtractor.mbobs):
+        model = _get_full_frame_model(s, band)
+        expected = s.mbobs[band][0].image - model
+
+        np.testing.assert_allclose(
+            obslist[0].image, expected,
+            rtol=0, atol=1.0e-6*np.abs(model).max(),
+        )
+
+
+@pytest.mark.parametrize('seed', [125, 871])
+def test_subtractor_add_source(seed):
+    """
+    test that within add_source only the other objects are subtracted,
+    and that the subtracted images are restored on exit
+    """
+    rng = np.random.RandomState(seed)
+    s, objs = _run_shredder(rng)
+
+    subtractor = shredder.ModelSubtractor(shredder=s, nobj=objs.size)
+
+    # full frame models for each object in each band
+    models = []
+    for band in range(len(s.mbobs)):
+        obs_orig = s.mbobs[band][0]
+        models.append([
+            subtractor.get_object_gmix_convolved(iobj, band).make_image(
+                obs_orig.image.shape,
+                jacobian=obs_orig.jacobian,
+                fast_exp=True,
+            )
+            for iobj in range(objs.size)
+        ])
+
+    subtracted = [obslist[0].image.copy() for obslist in subtractor.mbobs]
+
+    for iobj in range(objs.size):
+        with subtractor.add_source(iobj):
+            for band, obslist in enumerate(subtractor.mbobs):
+                band_models = models[band]
+                others = sum(
+                    model for i, model in enumerate(band_models) if i != iobj
+                )
+                expected = s.mbobs[band][0].image - others
+
+                np.testing.assert_allclose(
+                    obslist[0].image, expected,
+                    rtol=0, atol=1.0e-6*np.abs(band_models).max(),
+                )
+
+        for band, obslist in enumerate(subtractor.mbobs):
+            np.testing.assert_allclose(
+                obslist[0].image, subtracted[band],
+                rtol=0, atol=1.0e-10*np.abs(models[band]).max(),
+            )
+
+
+@pytest.mark.parametrize('seed', [9731, 7317])
+def test_subtractor_bad_columns(seed):
+    """
+    test zero weight pixels are left unmodified, and the rest match a full
+    frame model subtraction
+    """
+    rng = np.random.RandomState(seed)
+    s, objs = _run_shredder(rng, bad_columns=True)
+
+    subtractor = shredder.ModelSubtractor(shredder=s, nobj=objs.size)
+
+    for band, obslist in enumerate(subtractor.mbobs):
+        obs_orig = s.mbobs[band][0]
+        image = obslist[0].image
+
+        bad = obs_orig.weight <= 0
+        assert bad.any()
+        assert np.array_equal(image[bad], obs_orig.image[bad])
+
+        model = _get_full_frame_model(s, band)
+        expected = obs_orig.image - model
+
+        good = ~bad
+        np.testing.assert_allclose(
+            image[good], expected[good],
+            rtol=0, atol=1.0e-6*np.abs(model).max(),
+        )
+
+
+@pytest.mark.parametrize('seed', [125, 871])
+def test_subtractor_threads(seed):
+    """
+    test rendering in threads gives the same result as rendering serially
+    """
+    rng = np.random.RandomState(seed)
+    s, objs = _run_shredder(rng)
+
+    serial = shredder.ModelSubtractor(shredder=s, nobj=objs.size, nthreads=1)
+    threaded = shredder.ModelSubtractor(
+        shredder=s, nobj=objs.size, nthreads=None,
+    )
+
+    for band in range(len(s.mbobs)):
+        assert np.array_equal(
+            serial.mbobs[band][0].image,
+            threaded.mbobs[band][0].image,
+        )
+
+        serial_models = serial.model_images[band]
+        threaded_models = threaded.model_images[band]
+        assert len(serial_models) == len(threaded_models)
+
+        for smodel, tmodel in zip(serial_models, threaded_models):
+            assert smodel[:2] == tmodel[:2]
+            assert np.array_equal(smodel[2], tmodel[2])
+
+
+@pytest.mark.parametrize('seed', [31, 4417])
+def test_subtractor_generator(seed):
+    """
+    test the subtractor with a shredder run using a numpy Generator
+    """
+    rng = np.random.default_rng(seed)
+    s, objs = _run_shredder(rng)
+
+    subtractor = shredder.ModelSubtractor(shredder=s, nobj=objs.size)
+
+    for iobj in range(objs.size):
+        with subtractor.add_source(iobj):
+            subtractor.get_object_mbobs(index=iobj, stamp_size=32)
+
+
 @pytest.mark.parametrize('seed', [98, 12987])
 def test_subtractor_stamps(seed, show=False):
     stamp_size = 32
@@ -173,6 +354,101 @@ def test_subtractor_stamps(seed, show=False):
                 subtractor.plot_object(index=iobj, stamp_size=stamp_size)
 
 
+def _get_bbox_scalar(image_shape, row, col, stamp_size):
+    """
+    the original per-object bbox code, used as a reference
+    """
+    rad = int(stamp_size) // 2
+
+    icen = int(round(row))
+    row_start, row_end = icen - rad, icen + rad + 1
+    icen = int(round(col))
+    col_start, col_end = icen - rad, icen + rad + 1
+
+    if row_start == -1:
+        row_start += 1
+        col_start += 1
+
+    if col_start == -1:
+        col_start += 1
+        row_start += 1
+
+    if row_end == image_shape[0] + 1:
+        row_end -= 1
+        col_end -= 1
+
+    if col_end == image_shape[1] + 1:
+        col_end -= 1
+        row_end -= 1
+
+    for start, dim in zip((row_start, col_start), image_shape):
+        if start < 0 or start > dim:
+            raise IndexError('out of bounds')
+
+    return row_start, row_end, col_start, col_end
+
+
+def test_get_bboxes():
+    """
+    test the bboxes for all objects match the original per-object code,
+    including trimming at the edges and out of bounds centers
+    """
+    image_shape = (100, 100)
+    stamp_size = 32
+
+    cens = [
+        (50.0, 50.0),
+        # start == -1
+        (15.0, 50.0),
+        (50.0, 15.0),
+        # end == dim + 1
+        (84.0, 50.0),
+        (50.0, 84.0),
+        # corners where both trims apply
+        (15.0, 84.0),
+        (84.0, 15.0),
+        # .5 rounding
+        (40.5, 41.5),
+        (15.5, 84.5),
+        # out of bounds
+        (14.5, 50.0),
+        (50.0, 5.0),
+        (-20.0, 120.0),
+    ]
+    rows = np.array([cen[0] for cen in cens])
+    cols = np.array([cen[1] for cen in cens])
+
+    bboxes = _get_bboxes(
+        image_shape=image_shape, rows=rows, cols=cols, stamp_size=stamp_size,
+    )
+
+    # a subtractor with just enough set to get bboxes
+    subtractor = shredder.ModelSubtractor.__new__(shredder.ModelSubtractor)
+    subtractor.shredder = SimpleNamespace(
+        mbobs=[[SimpleNamespace(image=np.zeros(image_shape))]],
+    )
+    subtractor._bbox_cache = {}
+    subtractor._rowcols = rows, cols
+
+    nraise = 0
+    for index, (row, col) in enumerate(cens):
+        try:
+            expected = _get_bbox_scalar(image_shape, row, col, stamp_size)
+        except IndexError:
+            nraise += 1
+            with pytest.raises(IndexError):
+                subtractor._get_object_bbox(index, stamp_size)
+            continue
+
+        bbox = tuple(int(vals[index]) for vals in bboxes)
+        assert bbox == expected
+
+        bbox = subtractor._get_object_bbox(index, stamp_size)
+        assert bbox == expected
+
+    assert nraise == 3
+
+
 if __name__ == '__main__':
     shredder.setup_logging('info')
 
@@ -321,7 +321,7 @@ def plot_seg(seg, ax, rng=None):
     cseg = np.zeros((seg.shape[0], seg.shape[1], 3))
 
     if rng is None:
-        rng = np.random.RandomState()
+        rng = np.random.default_rng()
 
     useg = np.unique(seg)[1:]
 